@@ -1,33 +1,251 @@
-# Read the left list and the right list.
-left_list = []
-right_list = []
+import heapq
+import os
+import tempfile
+from array import array
+from operator import sub
 
-with open("input.txt", "r") as f:
-    for line in f:
-        line = line.strip()
-        halves = line.split()
-        left_list.append(int(halves[0]))
-        right_list.append(int(halves[1]))
 
-# Sort them (smallest first, then next smallest...)
-left_list = sorted(left_list)
-right_list = sorted(right_list)
+def load_lists(filename, chunk_size=1 << 20):
+    """Read the left list and the right list as two compact integer arrays.
 
-# Part 1: Find the total pairwise difference
-total = 0
-for left, right in zip(left_list, right_list):
-    total += abs(left - right)
+    The file is read about chunk_size characters (whole lines) at a time,
+    so only one chunk's worth of strings exists at once.
+    The numbers on each line are left, right.
+    """
+    left_list = array('q')
+    right_list = array('q')
+    with open(filename, "r") as f:
+        while True:
+            lines = f.readlines(chunk_size)
+            if not lines:
+                break
+            numbers = array('q', map(int, ''.join(lines).split()))
+            left_list.extend(numbers[0::2])
+            right_list.extend(numbers[1::2])
+    return left_list, right_list
 
-print(f"Part 1: {total}")
+def sort_array(numbers, chunk_size=1 << 16):
+    """A sorted copy of an integer array, still as an array.
+
+    Python can't sort an array without turning it into a list of ints,
+    so this isn't vectorized. To keep memory down, only chunk_size numbers
+    at a time become a list: each chunk is sorted into its own array,
+    and then the sorted chunks are merged into the result.
+    """
+    chunks = [array(numbers.typecode, sorted(numbers[start:start + chunk_size]))
+              for start in range(0, len(numbers), chunk_size)]
+    if len(chunks) == 1:
+        return chunks[0]
+    result = array(numbers.typecode)
+    result.extend(heapq.merge(*chunks))
+    return result
+
+def total_distance(left_list, right_list):
+    """The total pairwise difference of two equally long, sorted lists.
+
+    This is still a loop, but it's a loop of builtins (map, abs, sub),
+    with no Python bytecode per pair.
+    """
+    return sum(map(abs, map(sub, left_list, right_list)))
 
 
 # Part 2: Find the "similarity score"
 # Actually, the task is equivalent to summing the right list numbers
 # that appear anywhere in the left list.
 
-similarity = 0
-for r in right_list:
-    if r in left_list:
-        similarity += r
+def similarity_by_scan(left_list, right_list):
+    """The similarity score, checking each right number against the whole left list.
+
+    This is O(n^2), so it's only useful as a reference.
+    """
+    similarity = 0
+    for r in right_list:
+        if r in left_list:
+            similarity += r
+    return similarity
+
+def similarity_by_merge(left_list, right_list):
+    """The similarity score, walking the two sorted lists together.
+
+    Both lists must already be sorted. After the sort this is O(n).
+    """
+    similarity = 0
+    i = 0
+    for r in right_list:
+        # Skip past the left numbers that are too small to match
+        while i < len(left_list) and left_list[i] < r:
+            i += 1
+        if i < len(left_list) and left_list[i] == r:
+            similarity += r
+    return similarity
+
+def similarity_by_index(left_list, right_list):
+    """The similarity score, looking each right number up in a set of the left.
+
+    The whole sum runs inside builtins, so it's the fastest on big arrays.
+    """
+    return sum(filter(set(left_list).__contains__, right_list))
+
+
+# External-memory mode, for lists that don't fit in RAM.
+# The file is read in runs of at most max_pairs pairs.
+# Each run is sorted and spilled to a temporary file,
+# and then the sorted runs are merged back together as streams.
+
+def spill_run(numbers, directory):
+    """Sort the numbers and write them to a new file in directory. Return its path."""
+    fd, path = tempfile.mkstemp(dir=directory)
+    with os.fdopen(fd, "wb") as f:
+        sort_array(numbers).tofile(f)
+    return path
+
+def spill_sorted_runs(filename, max_pairs, directory):
+    """Split the file into sorted runs on disk.
+
+    Returns two lists of file paths: the left runs and the right runs.
+    """
+    left_runs = []
+    right_runs = []
+    left = array('q')
+    right = array('q')
+    with open(filename, "r") as f:
+        for line in f:
+            halves = line.split()
+            if not halves:
+                continue
+            left.append(int(halves[0]))
+            right.append(int(halves[1]))
+            if len(left) >= max_pairs:
+                left_runs.append(spill_run(left, directory))
+                right_runs.append(spill_run(right, directory))
+                left = array('q')
+                right = array('q')
+    if left:
+        left_runs.append(spill_run(left, directory))
+        right_runs.append(spill_run(right, directory))
+    return left_runs, right_runs
+
+def read_run(path, block_size):
+    """Yield the numbers of a spilled run, reading block_size of them at a time."""
+    with open(path, "rb") as f:
+        while True:
+            block = array('q')
+            try:
+                block.fromfile(f, block_size)
+            except EOFError:
+                # fromfile still keeps the partial last block
+                yield from block
+                return
+            yield from block
+
+def merge_runs(paths, block_size):
+    """Merge sorted runs on disk into one sorted stream."""
+    return heapq.merge(*(read_run(path, block_size) for path in paths))
+
+# The most runs to read from at once, to stay under the open file limit
+MAX_FAN_IN = 64
+
+def merge_down(paths, max_runs, max_pairs, directory):
+    """Merge groups of runs into bigger runs until there are at most max_runs.
+
+    Every merge reads at most MAX_FAN_IN runs at once,
+    so the number of open files stays bounded.
+    Returns the paths of the remaining runs.
+    """
+    while len(paths) > max_runs:
+        # Enough runs per group to get down to max_runs, but never too many
+        group_size = min(MAX_FAN_IN, -(-len(paths) // max_runs))
+        group_size = max(2, group_size)
+        block_size = max(1, max_pairs // (group_size + 1))
+        merged_paths = []
+        for start in range(0, len(paths), group_size):
+            group = paths[start:start + group_size]
+            if len(group) == 1:
+                merged_paths.append(group[0])
+                continue
+            fd, path = tempfile.mkstemp(dir=directory)
+            with os.fdopen(fd, "wb") as f:
+                block = array('q')
+                for number in merge_runs(group, block_size):
+                    block.append(number)
+                    if len(block) >= block_size:
+                        block.tofile(f)
+                        block = array('q')
+                block.tofile(f)
+            for old_path in group:
+                os.remove(old_path)
+            merged_paths.append(path)
+        paths = merged_paths
+    return paths
+
+def distance_and_similarity_external(filename, max_pairs=10**6):
+    """Part 1 and Part 2 without ever holding the whole lists in memory.
+
+    At most max_pairs pairs are held in memory at once,
+    both while spilling the sorted runs and while merging them.
+    If there are many runs, they are first merged into fewer, bigger runs,
+    so that at most MAX_FAN_IN files are open at once.
+    The merge walks the sorted left and right streams in lockstep for Part 1.
+    A second stream of the left runs trails the right stream for Part 2,
+    the same way as similarity_by_merge.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        left_runs, right_runs = spill_sorted_runs(filename, max_pairs, directory)
+        # The final merge reads the left runs twice and the right runs once
+        left_runs = merge_down(left_runs, MAX_FAN_IN // 3, max_pairs, directory)
+        right_runs = merge_down(right_runs, MAX_FAN_IN // 3, max_pairs, directory)
+        # Three merged streams share the memory budget
+        block_size = max(1, max_pairs // (3 * max(1, len(left_runs))))
+        lefts = merge_runs(left_runs, block_size)
+        rights = merge_runs(right_runs, block_size)
+        candidates = merge_runs(left_runs, block_size)
+
+        distance = 0
+        similarity = 0
+        candidate = next(candidates, None)
+        for left, right in zip(lefts, rights):
+            distance += abs(left - right)
+            # Skip past the left numbers that are too small to match
+            while candidate is not None and candidate < right:
+                candidate = next(candidates, None)
+            if candidate == right:
+                similarity += right
+    return distance, similarity
+
+EXTERNAL_MEMORY = False
+
+if EXTERNAL_MEMORY:
+    distance, similarity = distance_and_similarity_external("input.txt")
+    print(f"Part 1: {distance}")
+    print(f"Part 2: {similarity}")
+else:
+    # Read the left list and the right list.
+    left_list, right_list = load_lists("input.txt")
+
+    # Sort them (smallest first, then next smallest...)
+    left_list = sort_array(left_list)
+    right_list = sort_array(right_list)
+
+    # Part 1: Find the total pairwise difference
+    print(f"Part 1: {total_distance(left_list, right_list)}")
+    print(f"Part 2: {similarity_by_index(left_list, right_list)}")
+
+
+# Benchmark: both similarity kernels should take time proportional to the list length
+BENCHMARK = False
+
+if BENCHMARK:
+    import random
+    import time
 
-print(f"Part 2: {similarity}")
\ No newline at end of file
+    for size in [10**4, 10**5, 10**6, 10**7]:
+        left = sort_array(array('q', (random.randint(10000, 99999) for _ in range(size))))
+        right = sort_array(array('q', (random.randint(10000, 99999) for _ in range(size))))
+        start = time.perf_counter()
+        similarity_by_merge(left, right)
+        merge_elapsed = time.perf_counter() - start
+        start = time.perf_counter()
+        similarity_by_index(left, right)
+        index_elapsed = time.perf_counter() - start
+        print(f"{size:>10} pairs: merge {merge_elapsed:.3f}s ({merge_elapsed / size * 1e9:.1f} ns/pair), "
+              f"index {index_elapsed:.3f}s ({index_elapsed / size * 1e9:.1f} ns/pair)")
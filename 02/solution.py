@@ -1,3 +1,6 @@
+from operator import sub
+
+
 def first_differences(report: list):
     """The first differences of the sequence."""
     diffs = []
@@ -15,27 +18,105 @@ def is_safe(report: list):
     return False
 
 def is_safe_fault_tolerant(report: list):
-    """Is the report safe, after at most one level is removed?"""
+    """Is the report safe, after at most one level is removed?
+
+    This tries every removal, so it's O(k^2). It's kept as a reference
+    for is_safe_fault_tolerant_fast.
+    """
     for i in range(len(report)):
         pruned = report[:i] + report[i+1:]
         if is_safe(pruned):
             return True
     return False
 
-# Count the safe reports
-safe_count = 0
-safe_fault_tolerant_count = 0
+def is_safe_skipping(report: list, skip: int, sign: int):
+    """Is the report safe in the direction of sign, ignoring the level at index skip?"""
+    previous = None
+    for i, level in enumerate(report):
+        if i == skip:
+            continue
+        if previous is not None and not 1 <= (level - previous) * sign <= 3:
+            return False
+        previous = level
+    return True
+
+def is_safe_fault_tolerant_fast(report: list):
+    """Is the report safe, after at most one level is removed?
+
+    Same answer as is_safe_fault_tolerant, in a single pass without copying.
+    For each direction, find the first bad difference.
+    Only removing one of the two levels around it could fix it.
+    """
+    # An empty report has no level to remove
+    if not report:
+        return False
+    for sign in (1, -1):
+        for i in range(len(report) - 1):
+            if not 1 <= (report[i+1] - report[i]) * sign <= 3:
+                if is_safe_skipping(report, i, sign) or is_safe_skipping(report, i+1, sign):
+                    return True
+                break
+        else:
+            # No bad differences at all
+            return True
+    return False
 
-with open("input.txt", "r") as file:
-    for line in file:
-        line = line.strip()
-        report = list(map(int, line.split()))
+def read_reports(filename):
+    """Yield the reports in the file one at a time, as lists of ints."""
+    with open(filename, "r") as file:
+        for line in file:
+            yield list(map(int, line.split()))
 
-        # Check if the report is safe
-        if is_safe(report):
+def count_safe_reports(reports):
+    """Count the safe reports and the fault-tolerant safe reports, in one pass.
+
+    The reports can be any iterable, so they can be streamed from a file.
+    Each report's first differences are computed once for the plain check,
+    and only unsafe reports go on to is_safe_fault_tolerant_fast.
+    """
+    safe_count = 0
+    safe_fault_tolerant_count = 0
+    for report in reports:
+        diff_set = set(map(sub, report[1:], report[:-1]))
+        if diff_set <= {1, 2, 3} or diff_set <= {-1, -2, -3}:
             safe_count += 1
-        if is_safe_fault_tolerant(report):
+            # Like the reference, an empty report has no level to remove
+            if report:
+                safe_fault_tolerant_count += 1
+        elif is_safe_fault_tolerant_fast(report):
             safe_fault_tolerant_count += 1
+    return safe_count, safe_fault_tolerant_count
+
+# Count the safe reports
+safe_count, safe_fault_tolerant_count = count_safe_reports(read_reports("input.txt"))
 
 print(f"Part 1: {safe_count}")
-print(f"Part 2: {safe_fault_tolerant_count}")
\ No newline at end of file
+print(f"Part 2: {safe_fault_tolerant_count}")
+
+
+# Check the fast checks against the reference on random reports
+CHECK_AGAINST_REFERENCE = False
+
+if CHECK_AGAINST_REFERENCE:
+    import random
+
+    reports = []
+    for _ in range(100000):
+        # A random walk that is mostly safe, with some bad steps
+        sign = random.choice([1, -1])
+        report = [random.randint(1, 20)]
+        for _ in range(random.randint(0, 8)):
+            report.append(report[-1] + sign * random.choice([1, 2, 3, 1, 2, 3, 0, 4, -1, -2]))
+        # And the odd empty report
+        if random.random() < 0.01:
+            report = []
+        expected = is_safe_fault_tolerant(report)
+        actual = is_safe_fault_tolerant_fast(report)
+        assert actual == expected, f"{report}: expected {expected}, got {actual}"
+        reports.append(report)
+    print("Fast fault-tolerant check agrees with the reference")
+
+    expected = (sum(map(is_safe, reports)), sum(map(is_safe_fault_tolerant, reports)))
+    actual = count_safe_reports(reports)
+    assert actual == expected, f"expected {expected}, got {actual}"
+    print("Batch counts agree with the reference")
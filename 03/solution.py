@@ -1,4 +1,7 @@
+import multiprocessing
+import os
 import re
+from functools import reduce
 
 # Regexes, and what they save from the match
 
@@ -14,6 +17,13 @@ RE_DONT = r"(don't)\(\)"
 # with nonapplicable values as ""
 RE_COMMAND = RE_MUL + '|' + RE_DO + '|' + RE_DONT
 
+# The same, compiled once, for text and for raw bytes
+COMMAND = re.compile(RE_COMMAND)
+COMMAND_BYTES = re.compile(RE_COMMAND.encode())
+
+# The longest possible command, "mul(123,456)"
+MAX_COMMAND_LENGTH = 12
+
 
 def pull_commands(line):
     """Given a line of the file, return the commands.
@@ -21,7 +31,7 @@ def pull_commands(line):
     A command is either "do", "don't",
     or a mul which is represented as (x, y) where x and y are integers
     """
-    bare_commands = re.findall(RE_COMMAND, line)
+    bare_commands = COMMAND.findall(line)
     commands = []
     for x,y,do,dont in bare_commands:
         if x and y:
@@ -47,12 +57,130 @@ def run_commands(cmds, care_about_do):
     return total
 
 
-# Pull all the commands
-cmds = []
-with open('input.txt') as f:
-    for line in f:
-        cmds.extend(pull_commands(line))
+def run_file_streaming(filename, chunk_size=1 << 24):
+    """Run the commands in a file without holding the file in memory.
+
+    The file is read in chunks of raw bytes.
+    A command could straddle the end of a chunk, so a match is only trusted
+    if it starts far enough from the end that it can't have been cut off.
+    Everything after the last trusted match is carried into the next chunk.
+
+    Returns (total ignoring do/don't, total respecting do/don't).
+    """
+    total = 0
+    enabled_total = 0
+    enabled = True
+    carry = b''
+    with open(filename, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            buffer = carry + chunk
+            at_end = not chunk
+            # Matches starting at or after safe_end might be cut off
+            if at_end:
+                safe_end = len(buffer)
+            else:
+                safe_end = len(buffer) - (MAX_COMMAND_LENGTH - 1)
+            last_end = 0
+            for match in COMMAND_BYTES.finditer(buffer):
+                if match.start() >= safe_end:
+                    break
+                x, y, do, dont = match.groups()
+                if x and y:
+                    product = int(x) * int(y)
+                    total += product
+                    if enabled:
+                        enabled_total += product
+                elif do:
+                    enabled = True
+                elif dont:
+                    enabled = False
+                last_end = match.end()
+            if at_end:
+                break
+            carry = buffer[max(0, safe_end, last_end):]
+    return total, enabled_total
+
+
+# Parallel mode.
+# The file is split into chunks, and each chunk is summarized separately.
+# A chunk's summary is (total ignoring do/don't,
+#                       total if the chunk starts enabled,
+#                       total if the chunk starts disabled,
+#                       the last do/don't in the chunk as True/False, or None).
+# Summaries of neighboring chunks combine into the summary of both,
+# and that combination is associative, so the chunks can run anywhere.
+
+def summarize_chunk(args):
+    """Summarize the commands starting in bytes [start, end) of the file."""
+    filename, start, end = args
+    with open(filename, 'rb') as f:
+        f.seek(start)
+        # Read a little extra, in case the last command runs past the end.
+        # No command can start inside another one, so starting the scan
+        # partway through a command can't invent a false match.
+        buffer = f.read(end - start + MAX_COMMAND_LENGTH - 1)
+    total = 0
+    total_if_enabled = 0
+    total_if_disabled = 0
+    last_toggle = None
+    for match in COMMAND_BYTES.finditer(buffer):
+        if match.start() >= end - start:
+            break
+        x, y, do, dont = match.groups()
+        if x and y:
+            product = int(x) * int(y)
+            total += product
+            # Before the first toggle, the starting state decides
+            if last_toggle is None:
+                total_if_enabled += product
+            elif last_toggle:
+                total_if_enabled += product
+                total_if_disabled += product
+        elif do:
+            last_toggle = True
+        elif dont:
+            last_toggle = False
+    return total, total_if_enabled, total_if_disabled, last_toggle
+
+def combine_summaries(first, second):
+    """The summary of two neighboring chunks, first then second."""
+    total1, if_enabled1, if_disabled1, last1 = first
+    total2, if_enabled2, if_disabled2, last2 = second
+    # The state at the end of the first chunk, for each starting state
+    ends_enabled_if_enabled = True if last1 is None else last1
+    ends_enabled_if_disabled = False if last1 is None else last1
+    return (
+        total1 + total2,
+        if_enabled1 + (if_enabled2 if ends_enabled_if_enabled else if_disabled2),
+        if_disabled1 + (if_enabled2 if ends_enabled_if_disabled else if_disabled2),
+        last1 if last2 is None else last2,
+    )
+
+def run_file_parallel(filename, workers=None, chunk_size=1 << 24):
+    """Run the commands in a file on a pool of processes.
+
+    Returns (total ignoring do/don't, total respecting do/don't),
+    exactly as run_file_streaming does.
+    """
+    size = os.path.getsize(filename)
+    chunks = [(filename, start, min(start + chunk_size, size))
+              for start in range(0, size, chunk_size)]
+    # Fork, so the workers don't re-run this script on startup
+    with multiprocessing.get_context('fork').Pool(workers) as pool:
+        summaries = pool.map(summarize_chunk, chunks)
+    total, if_enabled, _, _ = reduce(combine_summaries, summaries, (0, 0, 0, None))
+    # The program starts enabled
+    return total, if_enabled
+
+
+PARALLEL = False
+
+# Run the commands as we go, in one stream or across processes
+if PARALLEL:
+    total, enabled_total = run_file_parallel('input.txt')
+else:
+    total, enabled_total = run_file_streaming('input.txt')
 
-# Run the commands
-print(f"Part 1: {run_commands(cmds, False)}")
-print(f"Part 2: {run_commands(cmds, True)}")
\ No newline at end of file
+print(f"Part 1: {total}")
+print(f"Part 2: {enabled_total}")
\ No newline at end of file
@@ -56,7 +56,171 @@ def count_x_mas(g):
     return count
 
 
+# Searching for many words at once.
+# Every row, column and diagonal is read once as a line of text
+# through an Aho-Corasick automaton:
+# a trie of all the words, where a failed step follows a "failure link"
+# to the longest suffix of the text so far that is still in the trie.
+# The trie also holds every word reversed, so reading a line forwards
+# finds the words written along it backwards too.
 
-print(f"Part 1: {count_xmas(grid)}")
-print(f"Part 2: {count_x_mas(grid)}")
+# The four line directions as (dr, dc). Reversed words cover the other four.
+LINE_DIRECTIONS = [(0, 1), (1, 0), (1, 1), (1, -1)]
+
+
+def build_automaton(patterns):
+    """Build an Aho-Corasick automaton for the patterns.
+
+    patterns is a list of (text, label) pairs.
+    Returns (goto, fail, output):
+    goto[state] maps a char to the next trie state,
+    fail[state] is the failure link of the state,
+    and output[state] is the list of labels of the texts that end at that state.
+    State 0 is the root.
+    """
+    goto = [{}]
+    fail = [0]
+    output = [[]]
+    # Build the trie
+    for text, label in patterns:
+        state = 0
+        for char in text:
+            if char not in goto[state]:
+                goto.append({})
+                fail.append(0)
+                output.append([])
+                goto[state][char] = len(goto) - 1
+            state = goto[state][char]
+        output[state].append(label)
+    # Breadth-first, link every state to its longest proper suffix in the trie
+    queue = list(goto[0].values())
+    for state in queue:
+        for char, child in goto[state].items():
+            queue.append(child)
+            link = fail[state]
+            while link and char not in goto[link]:
+                link = fail[link]
+            fail[child] = goto[link].get(char, 0)
+            # Texts ending at the suffix also end here
+            output[child] = output[child] + output[fail[child]]
+    return goto, fail, output
+
+def grid_lines(g, dr, dc):
+    """Every line of g in direction (dr, dc), as strings.
+
+    Each line starts at a cell whose previous cell in that direction is off the grid.
+    """
+    height = len(g)
+    width = len(g[0])
+    for r in range(height):
+        for c in range(width):
+            if 0 <= r - dr < height and 0 <= c - dc < width:
+                continue
+            line = []
+            line_r, line_c = r, c
+            while 0 <= line_r < height and 0 <= line_c < width:
+                line.append(g[line_r][line_c])
+                line_r += dr
+                line_c += dc
+            yield ''.join(line)
+
+def count_words(g, words):
+    """Count instances of each word in g, as a wordsearch, by direction.
+
+    Returns {word: {(dr, dc): count}} for all eight directions.
+    """
+    words = list(dict.fromkeys(word for word in words if word))
+    # Each word forwards, and backwards, labelled with which way it reads
+    patterns = [(word, (word, 1)) for word in words]
+    patterns += [(word[::-1], (word, -1)) for word in words]
+    goto, fail, output = build_automaton(patterns)
+    counts = {word: {} for word in words}
+    for dr, dc in LINE_DIRECTIONS:
+        for word in words:
+            counts[word][(dr, dc)] = 0
+            counts[word][(-dr, -dc)] = 0
+        for line in grid_lines(g, dr, dc):
+            state = 0
+            for char in line:
+                while state and char not in goto[state]:
+                    state = fail[state]
+                state = goto[state].get(char, 0)
+                for word, step in output[state]:
+                    counts[word][(step * dr, step * dc)] += 1
+    return counts
+
+# Searching for small 2D shapes ("stencils") with bitboards.
+# Each letter gets one big integer, with bit r*width + c set
+# wherever that letter is at row r, column c.
+# Shifting a bitboard right by dr*width + dc lines every cell up with
+# the cell dr rows down and dc columns right of it,
+# so ANDing shifted bitboards checks every position of a stencil at once.
+# A stencil is a list of equal-length strings, with '.' matching anything.
+
+
+def grid_bitboards(g):
+    """Return ({letter: bitboard}, width, height) for the grid g."""
+    height = len(g)
+    width = len(g[0])
+    bitboards = {}
+    for r, row in enumerate(g):
+        row = ''.join(row)
+        for letter in set(row):
+            # Bit c of the row is column c, so read the row backwards
+            row_bits = int(''.join('1' if cell == letter else '0' for cell in reversed(row)), 2)
+            bitboards[letter] = bitboards.get(letter, 0) | (row_bits << (r * width))
+    return bitboards, width, height
+
+def count_stencil(bitboards, width, height, stencil):
+    """Count the positions where the stencil matches the grid."""
+    stencil_height = len(stencil)
+    stencil_width = len(stencil[0])
+    if stencil_height > height or stencil_width > width:
+        return 0
+    # Only top-left corners that keep the whole stencil on the grid count.
+    # That also stops shifted cells from wrapping around into the next row.
+    row_anchors = (1 << (width - stencil_width + 1)) - 1
+    matches = 0
+    for r in range(height - stencil_height + 1):
+        matches |= row_anchors << (r * width)
+    for dr, stencil_row in enumerate(stencil):
+        for dc, letter in enumerate(stencil_row):
+            if letter == '.':
+                continue
+            matches &= bitboards.get(letter, 0) >> (dr * width + dc)
+    return matches.bit_count()
+
+def word_stencil(word, dr, dc):
+    """The stencil for a word written in direction (dr, dc)."""
+    cells = [(i * dr, i * dc) for i in range(len(word))]
+    min_r = min(r for r, c in cells)
+    min_c = min(c for r, c in cells)
+    stencil = [['.'] * (abs(dc) * (len(word) - 1) + 1)
+               for _ in range(abs(dr) * (len(word) - 1) + 1)]
+    for (r, c), letter in zip(cells, word):
+        stencil[r - min_r][c - min_c] = letter
+    return [''.join(row) for row in stencil]
+
+def count_xmas_by_stencils(g):
+    """Count instances of XMAS in g, in all eight directions, with bitboards."""
+    bitboards, width, height = grid_bitboards(g)
+    return sum(count_stencil(bitboards, width, height, word_stencil('XMAS', dr, dc))
+               for dr in [-1, 0, 1] for dc in [-1, 0, 1] if (dr, dc) != (0, 0))
+
+# The four ways two MASes can cross
+X_MAS_STENCILS = [
+    ['M.S', '.A.', 'M.S'],
+    ['M.M', '.A.', 'S.S'],
+    ['S.M', '.A.', 'S.M'],
+    ['S.S', '.A.', 'M.M'],
+]
+
+def count_x_mas_by_stencils(g):
+    """Count instances of MAS forming an X in g, with bitboards."""
+    bitboards, width, height = grid_bitboards(g)
+    return sum(count_stencil(bitboards, width, height, stencil) for stencil in X_MAS_STENCILS)
+
+
+print(f"Part 1: {sum(count_words(grid, ['XMAS'])['XMAS'].values())}")
+print(f"Part 2: {count_x_mas_by_stencils(grid)}")
 
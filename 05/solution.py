@@ -1,3 +1,5 @@
+import heapq
+
 # Extract the rules and updates from the input file
 
 rules = []   # List of tuples (before, after)
@@ -52,22 +54,219 @@ class Page():
         return compare_by_rules(self.number, other.number)
 
 
+# A straightforward rule index. RuleBook below is the fast version,
+# and these functions are kept as the reference to check it against.
+
+def index_rules(rules):
+    """Index the rules as a set of (before, after) pairs, for O(1) lookups."""
+    return set(rules)
+
+def follows_rules(update, rule_index):
+    """Does the update follow every rule? O(len(update)^2) lookups.
+
+    The update breaks a rule exactly when some later page
+    is required to come before some earlier page.
+    """
+    for i, earlier in enumerate(update):
+        for later in update[i+1:]:
+            if (later, earlier) in rule_index:
+                return False
+    return True
+
+def order_by_rules(update, rule_index):
+    """Reorder the update to follow the rules.
+
+    This is a topological sort (Kahn's algorithm) of the rules
+    between the pages in this update. Ties keep their original order.
+    Assumes no page appears twice in the update.
+    """
+    # The rules that apply to this update: who must come after whom
+    after = {page: [] for page in update}
+    blockers = {page: 0 for page in update}
+    for before in update:
+        for later in update:
+            if (before, later) in rule_index:
+                after[before].append(later)
+                blockers[later] += 1
+    # Repeatedly take the earliest page with nothing left that must precede it
+    position = {page: i for i, page in enumerate(update)}
+    ready = [(position[page], page) for page in update if blockers[page] == 0]
+    heapq.heapify(ready)
+    ordered = []
+    while ready:
+        _, page = heapq.heappop(ready)
+        ordered.append(page)
+        for later in after[page]:
+            blockers[later] -= 1
+            if blockers[later] == 0:
+                heapq.heappush(ready, (position[later], later))
+    if len(ordered) != len(update):
+        raise ValueError(f"The rules for update {update} contain a cycle")
+    return ordered
+
+
+class RuleBook():
+    """A fixed set of rules, compiled once to check and fix many updates.
+
+    Every page that appears in a rule gets one bit.
+    Each page then has a bitset of the pages that must come after it,
+    and a bitset of the pages that must come before it.
+    """
+    def __init__(self, rules):
+        self.bit = {}
+        for rule in rules:
+            for page in rule:
+                if page not in self.bit:
+                    self.bit[page] = 1 << len(self.bit)
+        self.successors = {page: 0 for page in self.bit}
+        self.predecessors = {page: 0 for page in self.bit}
+        for before, after in rules:
+            self.successors[before] |= self.bit[after]
+            self.predecessors[after] |= self.bit[before]
+
+    def validate(self, update):
+        """Does the update follow every rule? One bitset check per page."""
+        seen = 0
+        for page in update:
+            # Nothing already printed may be required to come after this page
+            if self.successors.get(page, 0) & seen:
+                return False
+            seen |= self.bit.get(page, 0)
+        return True
+
+    def correct(self, update):
+        """Reorder the update to follow the rules.
+
+        A topological sort like order_by_rules, using the bitsets
+        and a map of each page's position(s) in the update.
+        Ties go to the page that came first in the update.
+        A page may appear more than once; its copies are released together.
+        """
+        # Where each page's bit sits in the update
+        positions = {}
+        update_mask = 0
+        for i, page in enumerate(update):
+            bit = self.bit.get(page, 0)
+            positions.setdefault(bit, []).append(i)
+            update_mask |= bit
+        # How many pages in this update must come before each page?
+        blockers = [(self.predecessors.get(page, 0) & update_mask).bit_count() for page in update]
+
+        # Usually the rules order every pair of pages, and then the counts
+        # are all different and simply sorting by them gives the order.
+        if len(set(blockers)) == len(update):
+            ordered = [page for _, page in sorted(zip(blockers, update))]
+            if self.validate(ordered):
+                return ordered
+
+        # How many copies of each page are still to be placed
+        copies_left = {bit: len(indexes) for bit, indexes in positions.items()}
+        ready = [i for i, count in enumerate(blockers) if count == 0]
+        heapq.heapify(ready)
+        ordered = []
+        while ready:
+            i = heapq.heappop(ready)
+            ordered.append(update[i])
+            bit = self.bit.get(update[i], 0)
+            copies_left[bit] -= 1
+            # Only once every copy is placed are the pages after it free
+            if copies_left[bit]:
+                continue
+            # Visit each page in the update that must come after this one
+            successors = self.successors.get(update[i], 0) & update_mask
+            while successors:
+                lowest = successors & -successors
+                successors ^= lowest
+                for j in positions[lowest]:
+                    blockers[j] -= 1
+                    if blockers[j] == 0:
+                        heapq.heappush(ready, j)
+        if len(ordered) != len(update):
+            raise ValueError(f"The rules for update {update} contain a cycle")
+        return ordered
+
+    def validate_batch(self, updates):
+        """Which of these updates follow the rules? A list of booleans."""
+        return [self.validate(update) for update in updates]
+
+    def correct_batch(self, updates):
+        """Each of these updates, reordered to follow the rules."""
+        return [self.correct(update) for update in updates]
+
+
+rule_book = RuleBook(rules)
+
 total_already_correct = 0
 total_need_correction = 0
-for update in updates:
+to_correct = []
+for update, valid in zip(updates, rule_book.validate_batch(updates)):
     # Part 1: Total of the middle values of updates that already follow the rules
-    if all(does_conform(update, rule) for rule in rules):
+    if valid:
         total_already_correct += middle_value(update)
-    # Part 2: Total of the middle values of updates that need correction
     else:
-        # Make the update a list of Page objects
-        update = [Page(x) for x in update]
-        # Sort the update (which will sort according to the rules)
-        update.sort()
-        # Convert back to a list of ints
-        update = [x.number for x in update]
-        # Now add the middle value
-        total_need_correction += middle_value(update)
+        to_correct.append(update)
+# Part 2: Total of the middle values of updates that need correction
+for update in rule_book.correct_batch(to_correct):
+    total_need_correction += middle_value(update)
 
 print(f"Part 1: {total_already_correct}")
-print(f"Part 2: {total_need_correction}")
\ No newline at end of file
+print(f"Part 2: {total_need_correction}")
+
+
+# Check the rule book against the reference functions on random rules
+CHECK_AGAINST_REFERENCE = False
+
+if CHECK_AGAINST_REFERENCE:
+    import random
+
+    for _ in range(1000):
+        pages = random.sample(range(10, 100), 15)
+        density = random.random()
+        random_rules = [(pages[i], pages[j]) for i in range(15) for j in range(i+1, 15)
+                        if random.random() < density]
+        book = RuleBook(random_rules)
+        index = index_rules(random_rules)
+        for _ in range(20):
+            # Include some pages that no rule mentions
+            update = random.sample(pages + [1, 2], random.randint(1, 11))
+            assert book.validate(update) == follows_rules(update, index), update
+            assert book.correct(update) == order_by_rules(update, index), update
+            # Repeated pages aren't supported by the reference,
+            # but the corrected update must still follow the rules
+            update.append(random.choice(update))
+            corrected = book.correct(update)
+            assert sorted(corrected) == sorted(update), update
+            assert book.validate(corrected) and follows_rules(corrected, index), update
+    print("Rule book agrees with the reference")
+
+
+# Benchmark: throughput of a rule book with a large rule set
+BENCHMARK = False
+
+if BENCHMARK:
+    import random
+    import time
+
+    page_count = 200
+    update_count = 100000
+    update_length = 23
+    # Every pair of pages in a random total order: 19900 rules
+    order = random.sample(range(10000, 100000), page_count)
+    big_rules = [(order[i], order[j]) for i in range(page_count) for j in range(i+1, page_count)]
+    big_updates = [random.sample(order, update_length) for _ in range(update_count)]
+
+    start = time.perf_counter()
+    big_book = RuleBook(big_rules)
+    elapsed = time.perf_counter() - start
+    print(f"Compiled {len(big_rules)} rules in {elapsed:.3f}s")
+
+    start = time.perf_counter()
+    valid = big_book.validate_batch(big_updates)
+    elapsed = time.perf_counter() - start
+    print(f"Validated {update_count} updates in {elapsed:.3f}s ({update_count / elapsed:,.0f} updates/s)")
+
+    invalid = [update for update, ok in zip(big_updates, valid) if not ok]
+    start = time.perf_counter()
+    big_book.correct_batch(invalid)
+    elapsed = time.perf_counter() - start
+    print(f"Corrected {len(invalid)} updates in {elapsed:.3f}s ({len(invalid) / elapsed:,.0f} updates/s)")
@@ -1,3 +1,6 @@
+import multiprocessing
+from bisect import bisect_left, bisect_right, insort
+
 # Extract the grid as a list of strings
 grid = []
 
@@ -86,8 +89,188 @@ def count_looping_options(grid_width, grid_height, obstacles, guard_pos, guard_d
             count += 1
     return count
 
+# Jumping from turn to turn.
+# Instead of walking tile by tile, look up the next obstacle in the guard's
+# row or column, jump to the tile just before it, and turn.
+# Only the turn states need to be remembered to spot a loop.
+
+def obstacle_index(obstacles):
+    """Index the obstacles by column and by row, for finding the next one quickly.
+
+    Returns (columns, rows): columns[x] is the sorted list of obstacle ys
+    in column x, and rows[y] is the sorted list of obstacle xs in row y.
+    """
+    columns = {}
+    rows = {}
+    for x, y in obstacles:
+        columns.setdefault(x, []).append(y)
+        rows.setdefault(y, []).append(x)
+    for line in columns.values():
+        line.sort()
+    for line in rows.values():
+        line.sort()
+    return columns, rows
+
+def next_stop(index, guard_pos, guard_dir):
+    """Where does the guard stop, just before the next obstacle ahead?
+
+    Returns None if there's no obstacle ahead, so she leaves the grid.
+    """
+    columns, rows = index
+    x, y = guard_pos
+    dx, dy = guard_dir
+    # Moving along a column or along a row, with the obstacles on that line
+    if dx == 0:
+        line, along, step = columns.get(x, []), y, dy
+    else:
+        line, along, step = rows.get(y, []), x, dx
+    if step == 1:
+        i = bisect_right(line, along)
+        if i == len(line):
+            return None
+        along = line[i] - 1
+    else:
+        i = bisect_left(line, along) - 1
+        if i < 0:
+            return None
+        along = line[i] + 1
+    return (x, along) if dx == 0 else (along, y)
+
+def guard_loops(index, guard_pos, guard_dir):
+    """Does the guard end up in a loop? Jumps from turn to turn."""
+    turn_states = set()
+    while True:
+        guard_pos = next_stop(index, guard_pos, guard_dir)
+        if guard_pos is None:
+            return False
+        # Turn right
+        guard_dir = (guard_dir[1], -guard_dir[0])
+        # If we've turned here this way before, the guard is in a loop
+        if (guard_pos, guard_dir) in turn_states:
+            return True
+        turn_states.add((guard_pos, guard_dir))
+
+def add_obstacle(index, pos):
+    """Add one obstacle to the index, in place."""
+    columns, rows = index
+    x, y = pos
+    insort(columns.setdefault(x, []), y)
+    insort(rows.setdefault(y, []), x)
+
+def remove_obstacle(index, pos):
+    """Remove one obstacle (added by add_obstacle) from the index, in place."""
+    columns, rows = index
+    x, y = pos
+    column = columns[x]
+    del column[bisect_left(column, y)]
+    row = rows[y]
+    del row[bisect_left(row, x)]
+
+def count_looping_options_by_jumps(grid_width, grid_height, obstacles, guard_pos, guard_dir):
+    """How many different added obstacles would put the guard in a loop?
+
+    Same as count_looping_options, but checking each option with guard_loops.
+    The index is built once. Each option is added to it and then removed again.
+    """
+    count = 0
+    visited, _ = guard_path(grid_width, grid_height, obstacles, guard_pos, guard_dir)
+    index = obstacle_index(obstacles)
+    for additional_obstacle in visited:
+        if additional_obstacle == guard_pos:
+            continue
+        add_obstacle(index, additional_obstacle)
+        if guard_loops(index, guard_pos, guard_dir):
+            count += 1
+        remove_obstacle(index, additional_obstacle)
+    return count
+
+# Resuming from partway along the path.
+# An added obstacle only changes the guard's route from the moment
+# she would first step onto it. So each hypothetical run can start
+# from where she stood just before that step, instead of from the start.
+
+def guard_first_steps(grid_width, grid_height, obstacles, guard_pos, guard_dir):
+    """Each tile the guard visits, in order, with her state just before she first steps onto it.
+
+    Returns a list of (tile, (position, direction)). The starting tile isn't included.
+    """
+    first_steps = []
+    visited = {guard_pos}
+    visited_states = {(guard_pos, guard_dir)}
+    while True:
+        ahead = (guard_pos[0] + guard_dir[0], guard_pos[1] + guard_dir[1])
+        if ahead in obstacles:
+            guard_dir = (guard_dir[1], -guard_dir[0])
+        elif not (0 <= ahead[0] < grid_width and 0 <= ahead[1] < grid_height):
+            return first_steps
+        else:
+            if ahead not in visited:
+                visited.add(ahead)
+                first_steps.append((ahead, (guard_pos, guard_dir)))
+            guard_pos = ahead
+            # If she's already in a loop, she'll never reach anywhere new
+            if (guard_pos, guard_dir) in visited_states:
+                return first_steps
+            visited_states.add((guard_pos, guard_dir))
+
+def count_looping_options_incremental(grid_width, grid_height, obstacles, guard_pos, guard_dir):
+    """How many different added obstacles would put the guard in a loop?
+
+    Same as count_looping_options_by_jumps, but each option's run
+    resumes from the guard's state just before she first reaches it.
+    """
+    count = 0
+    index = obstacle_index(obstacles)
+    for additional_obstacle, (resume_pos, resume_dir) in guard_first_steps(
+            grid_width, grid_height, obstacles, guard_pos, guard_dir):
+        add_obstacle(index, additional_obstacle)
+        if guard_loops(index, resume_pos, resume_dir):
+            count += 1
+        remove_obstacle(index, additional_obstacle)
+    return count
+
+# Checking the options on several processes.
+# The obstacle index is built once in the parent, before the workers are forked,
+# so every worker inherits its own copy without it being sent over.
+# Workers are then only sent batches of (option, resume state).
+
+# The obstacle index the workers share, set just before forking
+shared_index = None
+
+def count_loops_in_batch(batch):
+    """How many of this batch of options put the guard in a loop? Runs in a worker."""
+    count = 0
+    for additional_obstacle, (resume_pos, resume_dir) in batch:
+        add_obstacle(shared_index, additional_obstacle)
+        if guard_loops(shared_index, resume_pos, resume_dir):
+            count += 1
+        remove_obstacle(shared_index, additional_obstacle)
+    return count
+
+def count_looping_options_parallel(grid_width, grid_height, obstacles, guard_pos, guard_dir,
+                                   workers=None, batch_size=256):
+    """How many different added obstacles would put the guard in a loop?
+
+    Same as count_looping_options_incremental, spread over a pool of
+    processes: workers of them, or one per CPU by default.
+    Each batch's count doesn't depend on which worker ran it,
+    so the total is always the same.
+    """
+    global shared_index
+    shared_index = obstacle_index(obstacles)
+    first_steps = guard_first_steps(grid_width, grid_height, obstacles, guard_pos, guard_dir)
+    batches = [first_steps[start:start + batch_size]
+               for start in range(0, len(first_steps), batch_size)]
+    with multiprocessing.get_context('fork').Pool(workers) as pool:
+        return sum(pool.map(count_loops_in_batch, batches))
+
+
+PARALLEL = False
 
 # Print the number of visited cells
 print(f"Part 1: {len(guard_path(grid_width, grid_height, obstacles, guard_pos, guard_dir)[0])}")
 # Print the number of obstacles that would cause the guard to loop
-print(f"Part 2: {count_looping_options(grid_width, grid_height, obstacles, guard_pos, guard_dir)}")
\ No newline at end of file
+if PARALLEL:
+    print(f"Part 2: {count_looping_options_parallel(grid_width, grid_height, obstacles, guard_pos, guard_dir)}")
+else:
+    print(f"Part 2: {count_looping_options_incremental(grid_width, grid_height, obstacles, guard_pos, guard_dir)}")
\ No newline at end of file
@@ -1,3 +1,10 @@
+import itertools
+import multiprocessing
+import random
+import time
+from bisect import bisect_right
+
+
 class Equation():
     """An equation with the operators missing. Some answer equals some parts."""
     def __init__(self, string):
@@ -18,7 +25,8 @@ def solveable(answer, parts, operations):
     if len(parts) == 1:
         return parts[0] == answer
     # If we've already exceeded the answer, we can't get back down to it
-    if parts[0] > answer:
+    # (unless a later part is 0, and multiplying by it brings us back to 0)
+    if parts[0] > answer and 0 not in parts[1:]:
         return False
     # Apply each operation to the first two parts and continue
     for op in operations:
@@ -27,10 +35,265 @@ def solveable(answer, parts, operations):
     # If none of that worked, it's not possible
     return False
 
-# The operations +, *, and ||
-ADD = lambda x, y: x + y
-MUL = lambda x, y: x * y
-CON = lambda x, y: int(str(x) + str(y))
+def solveable_backward(answer, parts, concatenation, n=None):
+    """Can we get the answer from the parts using + and *, and || if concatenation?
+
+    Works backward from the answer, undoing the last operation each time.
+    Undoing + is subtraction, and can't go below zero.
+    Undoing * only works if the division is exact,
+    or if the answer and the last part are both 0 (then anything before works).
+    Undoing || only works if the answer ends in the digits of the last part.
+    Most branches fail one of these right away.
+    Assumes the parts aren't negative.
+    Only the first n parts are used (default: all of them).
+    """
+    if n is None:
+        n = len(parts)
+    # If there are somehow no parts, it's doomed
+    if n == 0:
+        return False
+    # If we have one part, that's our result, and it should be the answer
+    if n == 1:
+        return parts[0] == answer
+    last = parts[n-1]
+    # Undo +
+    if answer >= last and solveable_backward(answer - last, parts, concatenation, n-1):
+        return True
+    # Undo *
+    if last == 0:
+        # x * 0 == 0 for every x, and the earlier parts always make some x
+        if answer == 0:
+            return True
+    elif answer % last == 0 and solveable_backward(answer // last, parts, concatenation, n-1):
+        return True
+    # Undo ||
+    if concatenation:
+        power = power_past(last)
+        if answer % power == last and solveable_backward(answer // power, parts, concatenation, n-1):
+            return True
+    return False
+
+# Powers of ten, for concatenating without going through strings
+POWERS_OF_TEN = [10 ** i for i in range(64)]
+
+def power_past(n):
+    """The smallest power of 10 greater than n (at least 10).
+
+    So x || n == x * power_past(n) + n, for non-negative x and n.
+    (For negative x, concatenation is defined by that same formula.)
+    """
+    i = max(1, bisect_right(POWERS_OF_TEN, n))
+    if i < len(POWERS_OF_TEN):
+        return POWERS_OF_TEN[i]
+    # Beyond the table
+    power = POWERS_OF_TEN[-1]
+    while power <= n:
+        power *= 10
+    return power
+
+
+# What an inverse returns when every x works, like for x * 0 == 0
+ANY_VALUE = object()
+
+class Operator():
+    """An operation that can go between two parts of an equation.
+
+    forward(x, y) is the result of x op y.
+    inverse(result, y), if given, is the x for which x op y == result,
+    None if there isn't one, or ANY_VALUE if every x works.
+    With inverses the solver can work backward.
+    monotonic means x op y is never less than x for positive y,
+    and never negative for non-negative x and y.
+    So a running total that has passed the answer can be given up on
+    (if no 0 part is left), and working backward never needs a negative value.
+    """
+    def __init__(self, name, forward, inverse=None, monotonic=False):
+        self.name = name
+        self.forward = forward
+        self.inverse = inverse
+        self.monotonic = monotonic
+
+    def __call__(self, x, y):
+        return self.forward(x, y)
+
+    def __repr__(self):
+        return f"Operator({self.name!r})"
+
+# All the known operators, by name
+OPERATORS = {}
+
+def register_operator(operator):
+    """Make an operator available by name in OPERATORS, and return it."""
+    OPERATORS[operator.name] = operator
+    return operator
+
+def exact_quotient(result, y):
+    """result / y, if y divides result exactly, otherwise None.
+
+    When y is 0, every x works for a result of 0, and none for any other result.
+    """
+    if y == 0:
+        return ANY_VALUE if result == 0 else None
+    if result % y == 0:
+        return result // y
+    return None
+
+def unconcatenate(result, y):
+    """The x with x || y == result, if result ends in the digits of y, otherwise None."""
+    power = power_past(y)
+    if result % power == y:
+        return result // power
+    return None
+
+# The operations +, *, and ||, plus some others for variants of the puzzle
+ADD = register_operator(Operator('+', lambda x, y: x + y, lambda r, y: r - y, monotonic=True))
+MUL = register_operator(Operator('*', lambda x, y: x * y, exact_quotient, monotonic=True))
+CON = register_operator(Operator('||', lambda x, y: x * power_past(y) + y, unconcatenate, monotonic=True))
+SUB = register_operator(Operator('-', lambda x, y: x - y, lambda r, y: r + y))
+XOR = register_operator(Operator('^', lambda x, y: x ^ y, lambda r, y: r ^ y))
+
+
+def solveable_with(answer, parts, operators):
+    """Can we get the answer from the parts using the operators?
+
+    If every operator has an inverse, work backward from the answer,
+    like solveable_backward. Otherwise search forward, like solveable.
+    Either way, remember the dead ends, so the same (position, value)
+    is never explored twice. If every operator is monotonic,
+    values that can no longer lead to the answer are pruned too.
+    """
+    if len(parts) == 0:
+        return False
+    monotonic = all(op.monotonic for op in operators)
+    # Past the last 0 part, a running total can't come back down
+    last_zero = max((i for i, part in enumerate(parts) if part == 0), default=0)
+    dead_ends = set()
+
+    def backward(target, n):
+        """Can the first n parts make target?"""
+        if n == 1:
+            return parts[0] == target
+        if (target, n) in dead_ends:
+            return False
+        for op in operators:
+            previous = op.inverse(target, parts[n-1])
+            if previous is ANY_VALUE:
+                # The earlier parts always make some value
+                return True
+            if previous is None or (monotonic and previous < 0):
+                continue
+            if backward(previous, n-1):
+                return True
+        dead_ends.add((target, n))
+        return False
+
+    def forward(total, n):
+        """Can total, made from the first n parts, be finished into the answer?"""
+        if n == len(parts):
+            return total == answer
+        if monotonic and n > last_zero and total > answer:
+            return False
+        if (total, n) in dead_ends:
+            return False
+        for op in operators:
+            if forward(op(total, parts[n]), n+1):
+                return True
+        dead_ends.add((total, n))
+        return False
+
+    if all(op.inverse is not None for op in operators):
+        return backward(answer, len(parts))
+    return forward(parts[0], 1)
+
+def solving_sets(answer, parts, operator_sets):
+    """Which of the operator sets can get the answer from the parts?
+
+    Returns a list of booleans, one per operator set.
+    The searches for the different sets share what they learn:
+    a set contained in a failed set fails too,
+    and a dead end for some set is a dead end for every set inside it.
+    So bigger sets are searched first.
+    Needs every operator to have an inverse; otherwise each set is searched separately.
+    """
+    operators = list(dict.fromkeys(op for operator_set in operator_sets for op in operator_set))
+    if len(parts) == 0:
+        return [False] * len(operator_sets)
+    if not all(op.inverse is not None for op in operators):
+        return [solveable_with(answer, parts, operator_set) for operator_set in operator_sets]
+    # Each operator is one bit, and a set of operators is a bitmask
+    set_masks = [sum(1 << operators.index(op) for op in set(operator_set))
+                 for operator_set in operator_sets]
+    # For each (target, n), the masks of the sets it's known to be a dead end for
+    dead_ends = {}
+
+    def backward(target, n, mask, inverses, monotonic):
+        """Can the first n parts make target, with the operators in mask?"""
+        if n == 1:
+            return parts[0] == target
+        dead_masks = dead_ends.get((target, n))
+        if dead_masks is not None and any(dead_mask & mask == mask for dead_mask in dead_masks):
+            return False
+        last = parts[n-1]
+        for inverse in inverses:
+            previous = inverse(target, last)
+            if previous is ANY_VALUE:
+                # The earlier parts always make some value
+                return True
+            if previous is None or (monotonic and previous < 0):
+                continue
+            if backward(previous, n-1, mask, inverses, monotonic):
+                return True
+        if dead_masks is None:
+            dead_ends[(target, n)] = [mask]
+        else:
+            dead_masks.append(mask)
+        return False
+
+    solved = {}
+    for mask in sorted(set(set_masks), key=lambda mask: -mask.bit_count()):
+        if any(failed_mask & mask == mask for failed_mask, ok in solved.items() if not ok):
+            solved[mask] = False
+        else:
+            chosen = [op for i, op in enumerate(operators) if mask & (1 << i)]
+            inverses = [op.inverse for op in chosen]
+            monotonic = all(op.monotonic for op in chosen)
+            solved[mask] = backward(answer, len(parts), mask, inverses, monotonic)
+    return [solved[mask] for mask in set_masks]
+
+
+# Sweeping many equations on several processes.
+# The operator sets are set just before the workers are forked,
+# so the workers inherit them (operators hold lambdas, which can't be sent).
+
+# The operator sets the workers check, set just before forking
+sweep_operator_sets = None
+
+def sweep_equation(equation):
+    """solving_sets for one (answer, parts) pair. Runs in a worker."""
+    answer, parts = equation
+    return solving_sets(answer, parts, sweep_operator_sets)
+
+def sweep(equations, operator_sets, workers=None, chunk_size=1000, report_every=None):
+    """Which operator sets solve each equation? A list of lists of booleans.
+
+    The equations are shared out over a pool of processes:
+    workers of them, or one per CPU by default.
+    The results come back in the same order as the equations.
+    If report_every is given, print progress and throughput every that many equations.
+    """
+    global sweep_operator_sets
+    sweep_operator_sets = operator_sets
+    results = []
+    start = time.perf_counter()
+    with multiprocessing.get_context('fork').Pool(workers) as pool:
+        jobs = [(e.answer, e.parts) for e in equations]
+        for result in pool.imap(sweep_equation, jobs, chunksize=chunk_size):
+            results.append(result)
+            if report_every and len(results) % report_every == 0:
+                elapsed = time.perf_counter() - start
+                print(f'{len(results)}/{len(jobs)} equations, {len(results) / elapsed:,.0f} equations/s')
+    return results
+
 
 # Read the equations from the input file
 equations = []
@@ -38,14 +301,57 @@ with open('input.txt', 'r') as f:
     for line in f:
         equations.append(Equation(line.strip()))
 
+PARALLEL = False
+
+# Find which operator sets solve each equation, in one search per equation
+operator_sets = [[ADD, MUL], [ADD, MUL, CON]]
+if PARALLEL:
+    results = sweep(equations, operator_sets, report_every=100000)
+else:
+    results = [solving_sets(e.answer, e.parts, operator_sets) for e in equations]
+
 # Count the solveable equations
 total_add_mul = 0
 total_add_mul_con = 0
-for e in equations:
-    if solveable(e.answer, e.parts, [ADD, MUL]):
+for e, (add_mul, add_mul_con) in zip(equations, results):
+    if add_mul:
         total_add_mul += e.answer
-    if solveable(e.answer, e.parts, [ADD, MUL, CON]):
+    if add_mul_con:
         total_add_mul_con += e.answer
 
 print(f'Part 1: {total_add_mul}')
-print(f'Part 2: {total_add_mul_con}')
\ No newline at end of file
+print(f'Part 2: {total_add_mul_con}')
+
+# Check the solvers against trying every combination of operators,
+# on small random equations (with zeros among the parts)
+CHECK_AGAINST_REFERENCE = False
+
+def solveable_exhaustive(answer, parts, operations):
+    """Can we get the answer from the parts using the operations? Tries every combination."""
+    for combination in itertools.product(operations, repeat=len(parts) - 1):
+        total = parts[0]
+        for op, part in zip(combination, parts[1:]):
+            total = op(total, part)
+        if total == answer:
+            return True
+    return False
+
+if CHECK_AGAINST_REFERENCE:
+    for _ in range(20000):
+        parts = [random.randint(0, 6) for _ in range(random.randint(1, 5))]
+        operations = random.choice([[ADD, MUL], [ADD, MUL, CON]])
+        # Mostly answers the parts can make, and sometimes any answer
+        answer = parts[0]
+        for part in parts[1:]:
+            answer = random.choice(operations)(answer, part)
+        if random.random() < 0.3:
+            answer = random.randint(0, 100)
+        expected = solveable_exhaustive(answer, parts, operations)
+        assert solveable(answer, parts, operations) == expected, (answer, parts)
+        assert solveable_backward(answer, parts, CON in operations) == expected, (answer, parts)
+        assert solveable_with(answer, parts, operations) == expected, (answer, parts)
+        assert solving_sets(answer, parts, [[ADD, MUL], operations]) == \
+            [solveable_exhaustive(answer, parts, [ADD, MUL]), expected], (answer, parts)
+        # Without an inverse for *, solveable_with searches forward instead
+        forward_operations = [Operator(op.name, op.forward, monotonic=op.monotonic) for op in operations]
+        assert solveable_with(answer, parts, forward_operations) == expected, (answer, parts)
@@ -1,4 +1,5 @@
 from collections import defaultdict
+from math import gcd
 
 # Read in the grid as a list of strings
 grid = []
@@ -58,16 +59,70 @@ def all_antinodes(ant1, ant2, grid_width, grid_height):
         y -= dy
     return antinodes
 
-# Count up the unique antinodes of each type
-total_simple_antinodes = set()
-total_antinodes = set()
-for frequency in antennas:
-    for i, ant1 in enumerate(antennas[frequency]):
-        for ant2 in antennas[frequency][i+1:]:
-            simple_antinodes = two_antinodes(ant1, ant2, grid_width, grid_height)
-            antinodes = all_antinodes(ant1, ant2, grid_width, grid_height)
-            total_simple_antinodes.update(simple_antinodes)
-            total_antinodes.update(antinodes)
+# Marking antinodes on a flat occupancy map.
+# The grid is one bytearray, with cell (x, y) at index y * grid_width + x,
+# set to 1 wherever there's an antinode.
+# The points of a line in the grid are evenly spaced in that flat index,
+# so a whole line can be marked with one slice assignment.
 
-print(f"Part 1: {len(total_simple_antinodes)}")
-print(f"Part 2: {len(total_antinodes)}")
\ No newline at end of file
+def steps_in_grid(v, dv, size):
+    """The range of k where 0 <= v + k * dv < size, as (lowest k, highest k).
+
+    If dv is 0, every k works (if v is in range at all), so return None.
+    If no k works, the lowest k is above the highest.
+    """
+    if dv == 0:
+        return None if 0 <= v < size else (1, 0)
+    if dv > 0:
+        return -(v // dv), (size - 1 - v) // dv
+    return -((size - 1 - v) // -dv), v // -dv
+
+def mark_line(occupancy, grid_width, grid_height, x, y, dx, dy, k_low, k_high):
+    """Mark (x + k*dx, y + k*dy) for k_low <= k <= k_high, where it's on the grid."""
+    for k_range in (steps_in_grid(x, dx, grid_width), steps_in_grid(y, dy, grid_height)):
+        if k_range is not None:
+            k_low = max(k_low, k_range[0])
+            k_high = min(k_high, k_range[1])
+    count = k_high - k_low + 1
+    if count <= 0:
+        return
+    start = (y + k_low * dy) * grid_width + (x + k_low * dx)
+    step = dy * grid_width + dx
+    # Slices are simplest going forwards
+    if step < 0:
+        start += (count - 1) * step
+        step = -step
+    occupancy[start:start + count * step:step] = b'\x01' * count
+
+def antinode_occupancy(antennas, grid_width, grid_height, resonant, exact_lattice=False):
+    """A flat occupancy map of the antinodes of every pair of same-frequency antennas.
+
+    Without resonance, each pair has the (up to) two antinodes of two_antinodes.
+    With resonance, each pair has all the antinodes of all_antinodes:
+    every whole step of (dx, dy) along the line through the pair.
+    If exact_lattice, the step is divided by gcd(dx, dy) first,
+    so every grid point exactly on the line is marked.
+    """
+    occupancy = bytearray(grid_width * grid_height)
+    for frequency_antennas in antennas.values():
+        for i, (x1, y1) in enumerate(frequency_antennas):
+            for x2, y2 in frequency_antennas[i+1:]:
+                dx = x2 - x1
+                dy = y2 - y1
+                if not resonant:
+                    # One step before ant1, and one step past ant2
+                    mark_line(occupancy, grid_width, grid_height, x1, y1, dx, dy, -1, -1)
+                    mark_line(occupancy, grid_width, grid_height, x1, y1, dx, dy, 2, 2)
+                    continue
+                if exact_lattice:
+                    divisor = gcd(dx, dy)
+                    dx //= divisor
+                    dy //= divisor
+                # The whole line, as far as the grid goes both ways
+                limit = grid_width + grid_height
+                mark_line(occupancy, grid_width, grid_height, x1, y1, dx, dy, -limit, limit)
+    return occupancy
+
+
+print(f"Part 1: {antinode_occupancy(antennas, grid_width, grid_height, False).count(1)}")
+print(f"Part 2: {antinode_occupancy(antennas, grid_width, grid_height, True).count(1)}")
\ No newline at end of file
@@ -1,3 +1,5 @@
+import heapq
+
 # Read in the "dense format" disk map as given
 with open('input.txt', 'r') as f:
     line = f.read().strip()
@@ -54,11 +56,55 @@ def checksum(block_map):
     return sum(i * block for i, block in enumerate(block_map))
 
 
+def run_checksum(file_id, start, size):
+    """The checksum of size blocks of file_id, starting at block start.
+
+    The block indexes form an arithmetic series, so this is
+    file_id * (start + (start+1) + ... + (start+size-1)).
+    """
+    return file_id * (size * start + size * (size - 1) // 2)
+
+def compacted_checksum(dense_map):
+    """The checksum after defrag_by_block, without expanding the blocks.
+
+    Walk the dense map from the front, keeping files where they are,
+    and fill each gap with blocks taken from the last file not yet moved.
+    Every run of blocks is added to the checksum in one go with run_checksum.
+    """
+    checksum = 0
+    position = 0
+    # The last file (files are at even indexes), and how much of it is left to move
+    j = len(dense_map) - 1
+    if j % 2 == 1:
+        j -= 1
+    remaining = dense_map[j] if j >= 0 else 0
+    i = 0
+    while i < j:
+        if i % 2 == 0:
+            # A file stays where it is
+            checksum += run_checksum(i // 2, position, dense_map[i])
+            position += dense_map[i]
+        else:
+            # A gap is filled from the back
+            gap = dense_map[i]
+            while gap and i < j:
+                moved = min(gap, remaining)
+                checksum += run_checksum(j // 2, position, moved)
+                position += moved
+                gap -= moved
+                remaining -= moved
+                if remaining == 0:
+                    j -= 2
+                    remaining = dense_map[j]
+        i += 1
+    # What's left of the last file that was being moved stays put
+    if i == j:
+        checksum += run_checksum(j // 2, position, remaining)
+    return checksum
+
+
 # Part 1
-block_map = decompress(dense_map)
-block_map = defrag_by_block(block_map)
-checksum = checksum(block_map)
-print(f'Part 1: {checksum}')
+print(f'Part 1: {compacted_checksum(dense_map)}')
 
 
 def dense_map_to_files_and_gaps(dense_map):
@@ -106,9 +152,75 @@ def defrag_by_file(files, gaps):
                 break
     return files, gaps
 
+def defrag_by_file_indexed(files, gaps):
+    """Defrag a disk map, moving files into gaps, file by file.
+
+    Same result as defrag_by_file, but the gaps are indexed by size:
+    for each size, a min-heap of the start indexes of the gaps that size.
+    The leftmost gap a file fits in is the smallest of the heap tops
+    for its size and up, so each file looks at no more than nine heaps.
+    Returns the files.
+    """
+    max_size = max((size for _, size in gaps), default=0)
+    gap_starts = [[] for _ in range(max_size + 1)]
+    for gap_start, gap_size in gaps:
+        if gap_size > 0:
+            gap_starts[gap_size].append(gap_start)
+    for heap in gap_starts:
+        heapq.heapify(heap)
+
+    files = list(files)
+    for f in range(len(files) - 1, -1, -1):
+        start, size = files[f]
+        # An empty file takes up no blocks, so it doesn't matter where it is
+        if size == 0:
+            continue
+        # Find the leftmost gap that fits
+        best_size = None
+        for gap_size in range(size, max_size + 1):
+            heap = gap_starts[gap_size]
+            if heap and heap[0] < start and (best_size is None or heap[0] < gap_starts[best_size][0]):
+                best_size = gap_size
+        if best_size is None:
+            continue
+        # Move the file there, and put what's left of the gap back
+        gap_start = heapq.heappop(gap_starts[best_size])
+        files[f] = (gap_start, size)
+        if best_size > size:
+            heapq.heappush(gap_starts[best_size - size], gap_start + size)
+    return files
+
+def files_checksum(files):
+    """Calculate the checksum of a list of files, one arithmetic series per file."""
+    return sum(run_checksum(f, start, size) for f, (start, size) in enumerate(files))
+
+
 # Part 2
 files, gaps = dense_map_to_files_and_gaps(dense_map)
-files, gaps = defrag_by_file(files, gaps)
+files = defrag_by_file_indexed(files, gaps)
+print(f'Part 2: {files_checksum(files)}')
+
+
+# Benchmark: indexed defrag vs. scanning the gaps, on random disk maps
+BENCHMARK = False
+# defrag_by_file is O(files * gaps), so it's only run on maps up to this size
+BENCHMARK_REFERENCE_LIMIT = 10**4
+
+if BENCHMARK:
+    import random
+    import time
 
-checksum = files_to_checksum(files)
-print(f'Part 2: {checksum}')
\ No newline at end of file
+    for size in [10**3, 10**4, 10**5, 10**6]:
+        random_map = [random.randint(1 if i % 2 == 0 else 0, 9) for i in range(size)]
+        files, gaps = dense_map_to_files_and_gaps(random_map)
+        start = time.perf_counter()
+        indexed_checksum = files_checksum(defrag_by_file_indexed(files, gaps))
+        indexed_elapsed = time.perf_counter() - start
+        line = f'{size:>8} digits: indexed {indexed_elapsed:.3f}s'
+        if size <= BENCHMARK_REFERENCE_LIMIT:
+            start = time.perf_counter()
+            scanned_files, _ = defrag_by_file(files, list(gaps))
+            scanning_elapsed = time.perf_counter() - start
+            assert files_checksum(scanned_files) == indexed_checksum
+            line += f', scanning {scanning_elapsed:.3f}s'
+        print(line)
\ No newline at end of file
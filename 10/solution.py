@@ -1,9 +1,4 @@
-# Read in the grid as a list of lists of ints
-grid = []
-with open('input.txt', 'r') as f:
-    for line in f:
-        grid.append([int(char) for char in line.strip()])
-
+from array import array
 
 def grid_index(grid, r, c):
     """Get the value at the given row and column in the grid."""
@@ -79,5 +74,102 @@ def total_rating(grid):
                 total += trailhead_rating(grid, graph, (r, c))
     return total
 
-print(f'Part 1: {total_score(grid)}')
-print(f'Part 2: {total_rating(grid)}')
\ No newline at end of file
+# A compact version of the map, for very big grids.
+# The whole grid is one bytearray, one byte per cell, with cell (r, c) at r * width + c.
+# The low 4 bits of a byte are the cell's height.
+# The high 4 bits say which neighbors are one higher (the graph's edges):
+# right, left, down and up, in that order from the lowest bit.
+
+RIGHT, LEFT, DOWN, UP = 1, 2, 4, 8
+
+def read_flat_grid(filename):
+    """Read the grid into (cells, width), with each cell's height and neighbor mask."""
+    with open(filename, 'r') as f:
+        lines = f.read().split()
+    width = len(lines[0])
+    # Digits to heights 0-9
+    cells = bytearray(''.join(lines).encode().translate(bytes.maketrans(b'0123456789', bytes(range(10)))))
+    for i, cell in enumerate(cells):
+        higher = cell + 1
+        c = i % width
+        mask = 0
+        if c + 1 < width and cells[i + 1] & 15 == higher:
+            mask |= RIGHT
+        if c > 0 and cells[i - 1] & 15 == higher:
+            mask |= LEFT
+        if i + width < len(cells) and cells[i + width] & 15 == higher:
+            mask |= DOWN
+        if i >= width and cells[i - width] & 15 == higher:
+            mask |= UP
+        cells[i] = cell | mask << 4
+    return cells, width
+
+# The 9s a cell can reach are at most 9 steps away,
+# so they're kept as a bitset over the 19x19 window centred on the cell:
+# the 9 at (r + dr, c + dc) is bit (dr + 9) * WINDOW + (dc + 9).
+# A neighbor's window is the cell's, moved by 1 (across) or WINDOW (down),
+# so the neighbor's bitset shifts by that much to land in the cell's window.
+WINDOW = 19
+WINDOW_CENTRE = 9 * WINDOW + 9
+
+def shift_window(nines, shift):
+    """A bitset of 9s from a neighbor's window, moved into a window shift bits further on."""
+    return nines << shift if shift >= 0 else nines >> -shift
+
+def neighbor_steps(width):
+    """For each neighbor mask, the neighbors it points to.
+
+    Each neighbor is (index offset, window shift): how far away it is in the flat grid,
+    and how far its bitset of 9s shifts to land in this cell's window.
+    """
+    steps = []
+    for mask in range(16):
+        steps.append([(offset, shift) for bit, offset, shift in
+                      ((RIGHT, 1, 1), (LEFT, -1, -1), (DOWN, width, WINDOW), (UP, -width, -WINDOW))
+                      if mask & bit])
+    return steps
+
+def flat_total_score_and_rating(cells, width):
+    """The total score and total rating of all trailheads, in one pass from height 9 down to 0.
+
+    Each cell's path count is the sum of its higher neighbors',
+    and its bitset of reachable 9s is the union of theirs, moved into its window.
+    Path counts are kept in a flat array, but bitsets only for the level above.
+    """
+    steps = neighbor_steps(width)
+    levels = [array('l') for _ in range(10)]
+    for i, cell in enumerate(cells):
+        levels[cell & 15].append(i)
+    path_counts = array('q', bytes(8 * len(cells)))
+    for i in levels[9]:
+        path_counts[i] = 1
+    above = dict.fromkeys(levels[9], 1 << WINDOW_CENTRE)
+    for height in range(8, -1, -1):
+        level = {}
+        for i in levels[height]:
+            paths = 0
+            nines = 0
+            for offset, shift in steps[cells[i] >> 4]:
+                paths += path_counts[i + offset]
+                nines |= shift_window(above[i + offset], shift)
+            path_counts[i] = paths
+            level[i] = nines
+        above = level
+    total_score = sum(nines.bit_count() for nines in above.values())
+    total_rating = sum(path_counts[i] for i in levels[0])
+    return total_score, total_rating
+
+cells, width = read_flat_grid('input.txt')
+total_score_flat, total_rating_flat = flat_total_score_and_rating(cells, width)
+print(f'Part 1: {total_score_flat}')
+print(f'Part 2: {total_rating_flat}')
+
+
+# Check the one-pass totals against searching from each trailhead
+CHECK_AGAINST_REFERENCE = False
+
+if CHECK_AGAINST_REFERENCE:
+    with open('input.txt', 'r') as f:
+        grid = [[int(x) for x in line] for line in f.read().split()]
+    assert total_score(grid) == total_score_flat
+    assert total_rating(grid) == total_rating_flat
\ No newline at end of file
@@ -1,11 +1,18 @@
-import math
+from collections import defaultdict
 from functools import lru_cache
+from operator import mul
 
 def num_length(n):
-    """How many decimal digits does n have?"""
-    if n == 0:
-        return 1
-    return int(math.log10(n)) + 1
+    """How many decimal digits does n have?
+
+    Counted with integers only, since math.log10 rounds wrongly for big n.
+    """
+    length = 1
+    power = 10
+    while power <= n:
+        power *= 10
+        length += 1
+    return length
 
 def split_num(n):
     """Split a number into two halves by its digits."""
@@ -34,8 +41,236 @@ def count_stone_line(stones, blinks):
     """These stones will become how many stones after blink blinks?"""
     return sum(count_stones(stone, blinks) for stone in stones)
     
+def blink(stone_counts):
+    """Blink once, for a whole multiset of stones given as {stone: multiplicity}."""
+    new_counts = defaultdict(int)
+    for n, count in stone_counts.items():
+        # Rule 1: 0 becomes 1
+        if n == 0:
+            new_counts[1] += count
+        # Rule 2: split even-digit numbers
+        elif num_length(n) % 2 == 0:
+            n1, n2 = split_num(n)
+            new_counts[n1] += count
+            new_counts[n2] += count
+        # Rule 3: multiply other numbers by 2024
+        else:
+            new_counts[n * 2024] += count
+    return new_counts
+
+def count_stone_line_iterative(stones, blinks):
+    """These stones will become how many stones after blink blinks?
+
+    Stones with the same number always turn out the same,
+    so only keep how many of each number there are, and blink them all at once.
+    There are only a few thousand different numbers ever, so memory stays flat
+    however many blinks there are.
+    """
+    stone_counts = defaultdict(int)
+    for stone in stones:
+        stone_counts[stone] += 1
+    for _ in range(blinks):
+        stone_counts = blink(stone_counts)
+    return sum(stone_counts.values())
+
+# Fast-forward mode, for blink counts far too big to blink one at a time.
+# The stones only ever become numbers from one closed set (a few thousand numbers),
+# so a blink is a sparse matrix over that set. The stone count after k blinks
+# then follows a linear recurrence no longer than the set, and the count after
+# any number of blinks comes from x ** blinks modulo the recurrence's polynomial,
+# by exponentiation by squaring.
+# Counts are modulo a prime: after 10**12 blinks the exact count has
+# about 10**11 digits.
+
+# A prime modulus
+MODULUS = 2**61 - 1
+
+def stone_children(n):
+    """The numbers a stone marked N becomes after one blink."""
+    # Rule 1: 0 becomes 1
+    if n == 0:
+        return (1,)
+    # Rule 2: split even-digit numbers
+    elif num_length(n) % 2 == 0:
+        return split_num(n)
+    # Rule 3: multiply other numbers by 2024
+    else:
+        return (n * 2024,)
+
+def closed_stone_set(stones):
+    """Every number these stones ever become, including themselves.
+
+    Returns the numbers as a list, and a dict from each number to its position.
+    """
+    numbers = []
+    index = {}
+    for n in stones:
+        if n not in index:
+            index[n] = len(numbers)
+            numbers.append(n)
+    i = 0
+    while i < len(numbers):
+        for child in stone_children(numbers[i]):
+            if child not in index:
+                index[child] = len(numbers)
+                numbers.append(child)
+        i += 1
+    return numbers, index
+
+def transition_matrix(numbers, index):
+    """The sparse blink matrix over a closed set of numbers.
+
+    Row i lists (j, multiplicity) for each number j that number i becomes.
+    """
+    rows = []
+    for n in numbers:
+        row = defaultdict(int)
+        for child in stone_children(n):
+            row[index[child]] += 1
+        rows.append(list(row.items()))
+    return rows
+
+def stone_count_sequence(counts, rows, length, modulus):
+    """The total stone count after 0, 1, ..., length - 1 blinks, modulo modulus.
+
+    counts is how many stones there are of each number, as a vector over the closed set.
+    """
+    sequence = []
+    for _ in range(length):
+        sequence.append(sum(counts) % modulus)
+        new_counts = [0] * len(counts)
+        for i, count in enumerate(counts):
+            if count:
+                for j, multiplicity in rows[i]:
+                    new_counts[j] += count * multiplicity
+        counts = [count % modulus for count in new_counts]
+    return sequence
+
+def shortest_recurrence(sequence, modulus):
+    """The shortest linear recurrence of a sequence modulo a prime (Berlekamp-Massey).
+
+    Returns the connection polynomial c, lowest coefficient first, with c[0] == 1 and
+    c[0] * s[n] + c[1] * s[n - 1] + ... + c[L] * s[n - L] == 0 for every n >= L.
+    """
+    connection = [1]
+    previous = [1]
+    previous_discrepancy = 1
+    length = 0
+    shift = 1
+    for n, term in enumerate(sequence):
+        discrepancy = (term + sum(map(mul, connection[1:length + 1],
+                                      reversed(sequence[n - length:n])))) % modulus
+        if discrepancy == 0:
+            shift += 1
+            continue
+        factor = discrepancy * pow(previous_discrepancy, -1, modulus) % modulus
+        updated = connection + [0] * (len(previous) + shift - len(connection))
+        for i, c in enumerate(previous):
+            updated[i + shift] = (updated[i + shift] - factor * c) % modulus
+        if 2 * length <= n:
+            previous = connection
+            previous_discrepancy = discrepancy
+            length = n + 1 - length
+            shift = 1
+        else:
+            shift += 1
+        connection = updated
+    return (connection + [0] * length)[:length + 1]
+
+def poly_mul(a, b, modulus):
+    """The product of two polynomials (coefficients lowest first) modulo modulus.
+
+    Each polynomial is packed into one big integer (Kronecker substitution),
+    so the product is a single big-integer multiplication.
+    Coefficients must already be in range(modulus).
+    """
+    if not a or not b:
+        return []
+    slot = (2 * modulus.bit_length() + min(len(a), len(b)).bit_length()) // 8 + 1
+    a_packed = int.from_bytes(b''.join(c.to_bytes(slot, 'little') for c in a), 'little')
+    b_packed = int.from_bytes(b''.join(c.to_bytes(slot, 'little') for c in b), 'little')
+    product = (a_packed * b_packed).to_bytes(slot * (len(a) + len(b)), 'little')
+    return [int.from_bytes(product[i:i + slot], 'little') % modulus
+            for i in range(0, slot * (len(a) + len(b) - 1), slot)]
+
+def inverse_series(f, length, modulus):
+    """g with f * g == 1 modulo x ** length, by Newton iteration. f[0] must be invertible."""
+    g = [pow(f[0], -1, modulus)]
+    precision = 1
+    while precision < length:
+        precision = min(2 * precision, length)
+        # g = g * (2 - f * g)
+        error = [(-c) % modulus for c in poly_mul(f[:precision], g, modulus)[:precision]]
+        error[0] = (error[0] + 2) % modulus
+        g = poly_mul(g, error, modulus)[:precision]
+    return g
+
+def poly_mod(a, characteristic, inverse_reversed, modulus):
+    """a modulo the monic polynomial characteristic.
+
+    inverse_reversed is the inverse series of characteristic reversed,
+    so the quotient takes two multiplications and no long division.
+    """
+    degree = len(characteristic) - 1
+    if len(a) <= degree:
+        return a
+    quotient_length = len(a) - degree
+    reversed_quotient = poly_mul(a[::-1][:quotient_length],
+                                 inverse_reversed[:quotient_length], modulus)
+    quotient = reversed_quotient[:quotient_length][::-1]
+    product = poly_mul(quotient, characteristic, modulus)
+    return [(x - y) % modulus for x, y in zip(a[:degree], product)]
+
+def power_of_x(exponent, characteristic, modulus):
+    """x ** exponent modulo the monic polynomial characteristic, by squaring."""
+    degree = len(characteristic) - 1
+    inverse_reversed = inverse_series(characteristic[::-1], degree, modulus)
+    result = [1]
+    base = poly_mod([0, 1], characteristic, inverse_reversed, modulus)
+    while exponent:
+        if exponent & 1:
+            result = poly_mod(poly_mul(result, base, modulus), characteristic, inverse_reversed, modulus)
+        base = poly_mod(poly_mul(base, base, modulus), characteristic, inverse_reversed, modulus)
+        exponent >>= 1
+    return result
+
+def count_stone_line_fast_forward(stones, blinks, modulus=MODULUS):
+    """These stones will become how many stones after blink blinks, modulo a prime?
+
+    The time depends on the size of the closed set (and only logarithmically on blinks):
+    the recurrence is no longer than the closed set,
+    so blinking the sparse matrix twice that many times pins it down.
+    """
+    numbers, index = closed_stone_set(stones)
+    rows = transition_matrix(numbers, index)
+    counts = [0] * len(numbers)
+    for stone in stones:
+        counts[index[stone]] += 1
+    length = min(blinks + 1, 2 * len(numbers))
+    sequence = stone_count_sequence(counts, rows, length, modulus)
+    if blinks < length:
+        return sequence[blinks]
+    connection = shortest_recurrence(sequence, modulus)
+    if len(connection) == 1:
+        # The count is 0 from the start
+        return 0
+    # x ** L + c[1] * x ** (L - 1) + ... + c[L], lowest coefficient first
+    characteristic = connection[::-1]
+    remainder = power_of_x(blinks, characteristic, modulus)
+    return sum(map(mul, remainder, sequence)) % modulus
+
 with open('input.txt', 'r') as f:
     stones = [int(x) for x in f.read().split()]
 
-print(f'Part 1: {count_stone_line(stones, 25)}')
-print(f'Part 2: {count_stone_line(stones, 75)}')
\ No newline at end of file
+print(f'Part 1: {count_stone_line_iterative(stones, 25)}')
+print(f'Part 2: {count_stone_line_iterative(stones, 75)}')
+
+# Check the fast-forward mode against blinking one at a time
+CHECK_AGAINST_REFERENCE = False
+
+if CHECK_AGAINST_REFERENCE:
+    # A lone 0 has a small closed set, so these go through the recurrence
+    for check_stones, blinks in [(stones, 0), (stones, 25), (stones, 75), ([0], 500), ([0, 2024], 3000)]:
+        expected = count_stone_line_iterative(check_stones, blinks) % MODULUS
+        assert count_stone_line_fast_forward(check_stones, blinks) == expected, blinks
+    print(f'10**12 blinks: {count_stone_line_fast_forward(stones, 10**12)} (mod {MODULUS})')
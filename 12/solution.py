@@ -1,3 +1,5 @@
+from operator import mul
+
 # Read in the grid as a list of strings
 with open('input.txt', 'r') as f:
     grid = f.read().splitlines()
@@ -30,6 +32,8 @@ def get_regions(grid):
     
     A region is a set of cells with the same letter,
     connected by orthogonal steps.
+    Every cell is checked against every region so far,
+    so this is only useful as a reference.
     """
     regions = []
     for r in range(len(grid)):
@@ -98,5 +102,112 @@ def region_score_by_sides(region):
     # A region's side count = its corner count.
     return region_area(region) * region_corner_count(region)
 
-print(f'Part 1: {sum(region_score_by_perim(region) for region in get_regions(grid))}')
-print(f'Part 2: {sum(region_score_by_sides(region) for region in get_regions(grid))}')
\ No newline at end of file
+# Labeling engine: every cell gets its region's number in one pass,
+# and then one sweep finds every region's area, perimeter and corners.
+
+def find(parent, i):
+    """The root of i's set, halving the path on the way."""
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+def label_regions(grid):
+    """The region number of every cell, and how many regions there are.
+
+    The labels are a flat list, row by row, with regions numbered from 0.
+    One raster pass joins each cell to the same letters above and to its left
+    (union-find), and then every cell is given its root's number.
+    """
+    h, w = len(grid), len(grid[0])
+    parent = list(range(h * w))
+    for r in range(h):
+        row = grid[r]
+        for c in range(w):
+            i = r * w + c
+            if c > 0 and row[c - 1] == row[c]:
+                parent[find(parent, i)] = find(parent, i - 1)
+            if r > 0 and grid[r - 1][c] == row[c]:
+                a, b = find(parent, i), find(parent, i - w)
+                if a != b:
+                    parent[a] = b
+    region_numbers = {}
+    labels = []
+    for i in range(h * w):
+        root = find(parent, i)
+        if root not in region_numbers:
+            region_numbers[root] = len(region_numbers)
+        labels.append(region_numbers[root])
+    return labels, len(region_numbers)
+
+def region_measures(grid):
+    """The area, perimeter and corner count of every region, as three lists.
+
+    Every 2x2 window of cells is visited once, with one cell of -1 all around the grid.
+    The window's top left cell counts towards its region's area.
+    Each region in the window gets a fence on the top and left edge of the top right
+    and bottom left cells where the labels differ, and corners at the window's centre
+    by the same rule as region_corner_count.
+    """
+    labels, region_count = label_regions(grid)
+    h, w = len(grid), len(grid[0])
+    # Pad the labels with -1 all around
+    padded_w = w + 2
+    padded = [-1] * padded_w
+    for r in range(h):
+        padded.append(-1)
+        padded.extend(labels[r * w:(r + 1) * w])
+        padded.append(-1)
+    padded.extend([-1] * padded_w)
+
+    areas = [0] * region_count
+    perimeters = [0] * region_count
+    corners = [0] * region_count
+    for r in range(h + 1):
+        for i in range(r * padded_w, r * padded_w + w + 1):
+            top_left = padded[i]
+            top_right = padded[i + 1]
+            bottom_left = padded[i + padded_w]
+            bottom_right = padded[i + padded_w + 1]
+            if top_left == top_right == bottom_left == bottom_right:
+                # Inside a region (or outside the grid): no fences, no corners
+                if top_left != -1:
+                    areas[top_left] += 1
+                continue
+            if top_left != -1:
+                areas[top_left] += 1
+            # Fences between the top left cell and its right and bottom neighbors
+            for neighbor in (top_right, bottom_left):
+                if neighbor != top_left:
+                    if top_left != -1:
+                        perimeters[top_left] += 1
+                    if neighbor != -1:
+                        perimeters[neighbor] += 1
+            # Corners at the centre of the window, for each region in it
+            for label in {top_left, top_right, bottom_left, bottom_right}:
+                if label == -1:
+                    continue
+                in_top_left = top_left == label
+                in_bottom_right = bottom_right == label
+                in_count = (in_top_left + (top_right == label)
+                            + (bottom_left == label) + in_bottom_right)
+                # One or three in the region is a corner
+                if in_count == 1 or in_count == 3:
+                    corners[label] += 1
+                # Two diagonal cells in the region are two corners
+                elif in_count == 2 and in_top_left == in_bottom_right:
+                    corners[label] += 2
+    return areas, perimeters, corners
+
+areas, perimeters, corners = region_measures(grid)
+print(f'Part 1: {sum(map(mul, areas, perimeters))}')
+print(f'Part 2: {sum(map(mul, areas, corners))}')
+
+
+# Check the labeling engine against finding the regions one at a time
+CHECK_AGAINST_REFERENCE = False
+
+if CHECK_AGAINST_REFERENCE:
+    reference = sorted((region_area(region), region_perimeter(region), region_corner_count(region))
+                       for region in get_regions(grid))
+    assert sorted(zip(areas, perimeters, corners)) == reference
\ No newline at end of file